@@ -2,20 +2,22 @@
 API routes for the unified analysis endpoint.
 Handles both breath and speech analysis with proper error handling.
 """
+import asyncio
 import os
+import shutil
 import tempfile
 from typing import Optional
-from fastapi import APIRouter, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, UploadFile, Form, HTTPException
+from fastapi.responses import ORJSONResponse
 
-from ..services.analysis_service import AnalysisService
+from ..services.analysis_service import AnalysisService, get_analysis_service
+from ..services.audio_utils import AUDIO_TMP_DIR
 from ..core.config import settings
 
 router = APIRouter()
-analysis_service = AnalysisService()
 
 @router.get("/health")
-async def health_check():
+async def health_check(analysis_service: AnalysisService = Depends(get_analysis_service)):
     """Health check endpoint"""
     # Include Supabase connection status
     supabase_status = analysis_service.supabase_service.get_connection_status()
@@ -33,7 +35,8 @@ async def health_check():
 async def analyze_audio(
     file: UploadFile,
     task_type: str = Form(...),
-    min_duration: Optional[float] = Form(0.5)
+    min_duration: Optional[float] = Form(0.5),
+    analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """
     Unified endpoint for analyzing breath and speech recordings.
@@ -58,35 +61,35 @@ async def analyze_audio(
             detail='task_type must be either "breath" or "speech"'
         )
     
+    # Cheap RIFF/WAVE magic check on the first 12 bytes, before any temp file exists
+    header = await file.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise HTTPException(
+            status_code=400,
+            detail="Uploaded file is not a valid WAV (missing RIFF/WAVE header)"
+        )
+    await file.seek(0)
+
+    tmp_path = None
     try:
-        # Save uploaded file
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, "input.wav")
-        
-        with open(temp_path, "wb") as f:
-            contents = await file.read()
-            f.write(contents)
-        
+        # Save uploaded file. The handle is closed before analysis so the path can be
+        # reopened by name (Windows refuses that while it is open); removed in finally.
+        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False, dir=AUDIO_TMP_DIR) as tf:
+            tmp_path = tf.name
+            # One worker-thread hop copies the spooled upload in 1 MiB chunks
+            # (instead of a threadpool round trip per awaited read)
+            await asyncio.to_thread(shutil.copyfileobj, file.file, tf, 1 << 20)
+
         # Analyze audio
         result = await analysis_service.analyze_audio(
-            temp_path,
+            tmp_path,
             task_type,
             min_duration
         )
-        
-        # Clean up
-        os.remove(temp_path)
-        os.rmdir(temp_dir)
-        
-        return JSONResponse(content=result)
-        
+
+        return ORJSONResponse(content=result)
+
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        if os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
-            
         if isinstance(e, HTTPException):
             raise e
         
@@ -95,8 +98,12 @@ async def analyze_audio(
             detail=str(e)
         )
 
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 @router.get("/test-db")
-async def test_database():
+async def test_database(analysis_service: AnalysisService = Depends(get_analysis_service)):
     """Test database connection and save a sample record"""
     try:
         # Test with minimal data to see if we can save anything
@@ -109,7 +116,9 @@ async def test_database():
             "extra": {"test": True}
         }
         
-        result = analysis_service.supabase_service.client.table("analysis_history").insert(test_record).execute()
+        # .execute() is blocking HTTP; run it in a worker thread like the service's own queries
+        query = analysis_service.supabase_service.client.table("analysis_history").insert(test_record)
+        result = await asyncio.to_thread(query.execute)
         
         if result.data:
             return {
@@ -3,8 +3,9 @@ Core configuration module for the backend service.
 Handles environment variables and paths.
 """
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -26,6 +27,14 @@ class Settings(BaseSettings):
     MIN_DURATION: float = 0.5  # minimum audio duration in seconds
     PREFER_HF: bool = False    # prefer local model over Hugging Face
     
+    # Prediction micro-batching: most rows per predict_proba call, and how long
+    # the first queued request waits for others to join its batch
+    PREDICT_BATCH_MAX: int = 32
+    PREDICT_BATCH_WAIT_MS: float = 5.0
+
+    # Allowed browser origins, e.g. CORS_ORIGINS='["https://app.example.org"]'; "*" allows any
+    CORS_ORIGINS: List[str] = ["*"]
+
     # Hugging Face settings
     HF_TOKEN: Optional[str] = None
     HF_SPACES_URL: Optional[str] = None
@@ -47,13 +56,33 @@ class Settings(BaseSettings):
         Path(__file__).parent.parent.parent,
         "data/raw"
     )
+    # Directory for scratch upload WAVs; None uses the system temp dir. Point it at a
+    # tmpfs such as /dev/shm only if that mount is sized for concurrent uploads
+    # (Docker gives /dev/shm 64 MB by default).
+    AUDIO_TMP_DIR: Optional[str] = None
+
+    # Per-upload extracted features, keyed by content hash; survives restarts
+    ANALYSIS_CACHE_DIR: str = os.path.join(
+        Path(__file__).parent.parent.parent,
+        "data/analysis_cache"
+    )
+    # Bounds for that cache: entries older than the TTL are dropped, and only the
+    # newest ANALYSIS_CACHE_MAX_ENTRIES files are kept
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 1024
+    ANALYSIS_CACHE_TTL_S: float = 7 * 24 * 3600
     
     class Config:
         env_file = os.path.join(Path(__file__).parent.parent.parent.parent, ".env")
         case_sensitive = True
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings; env vars and .env are parsed and validated once."""
+    return Settings()
+
+settings = get_settings()
 
 # Ensure directories exist
 os.makedirs(settings.FEATURE_DIR, exist_ok=True)
 os.makedirs(settings.RAW_AUDIO_DIR, exist_ok=True)
+os.makedirs(settings.ANALYSIS_CACHE_DIR, exist_ok=True)
@@ -1,25 +1,54 @@
 """
 Main FastAPI application for the breath and speech analysis backend.
 """
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .api.endpoints import router as api_router
+from .services.analysis_service import get_analysis_service
+from .core.config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pay librosa JIT/FFT-plan and forest first-call costs at boot, not on the first upload."""
+    # Also builds the shared AnalysisService (model load) before the first request
+    service = await asyncio.to_thread(get_analysis_service)
+    await asyncio.to_thread(service.warm_up)
+    yield
+
 
 app = FastAPI(
     title="Breath-Easy Analysis API",
     description="API for analyzing breath and speech patterns for respiratory health assessment",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Add CORS middleware
+# Add CORS middleware; only the methods/headers the clients actually send
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
+    allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
+
+
+@app.get("/health")
+async def root_health_check():
+    """Root health check endpoint for the API"""
+    return {
+        "status": "healthy",
+        "timestamp": time.time(),
+        "version": "1.0.0"
+    }
@@ -3,24 +3,121 @@ Service for analyzing audio files and generating predictions.
 Now includes smart input-type detection and dynamic verdict mapping.
 """
 import os
+import asyncio
+import hashlib
 import logging
 import time
-from typing import Dict, Any
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Set, Tuple
 from fastapi import HTTPException
-import librosa
+import joblib
+import numpy as np
+from ..core.config import settings
 from .audio_utils import normalize_audio, AudioNormalizationError
-from .feature_extraction import extract_features, detect_input_type,detect_task_type
+from .feature_extraction import FEATURE_VERSION, extract_features, detect_input_type,detect_task_type
 from .model_service import ModelService
-from .supabase_service import SupabaseService
+from .prediction_batcher import PredictionBatcher
+from .supabase_service import get_supabase_service
 
 logger = logging.getLogger(__name__)
 
+FEATURE_CACHE_SIZE = 256
+
+# Counter the model's bias toward heavy_breathing; unlisted labels keep factor 1.0
+REBALANCE_FACTORS: Mapping[str, float] = MappingProxyType({
+    "cough": 2.5,
+    "throat_clearing": 2.2,
+    "normal": 1.0,
+    "heavy_breathing": 0.6
+})
+
+
+# Acoustic label -> likely associated conditions, and the joined form used in the summary
+DISEASE_MAP: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "cough": ("URTI", "Bronchitis", "Post-COVID irritation"),
+    "heavy_breathing": ("COPD", "Asthma", "Pneumonia"),
+    "throat_clearing": ("Post-COVID", "Allergy", "Reflux"),
+    "normal": ("Healthy",),
+})
+DISEASE_HINTS: Mapping[str, str] = MappingProxyType({k: ", ".join(v) for k, v in DISEASE_MAP.items()})
+
+VERDICT_MAP: Mapping[str, str] = MappingProxyType({
+    "cough": "🤧 Detected cough pattern — possible bronchitis, infection, or post-COVID irritation.",
+    "heavy_breathing": "⚠️ Detected heavy breathing — may indicate asthma, COPD, or exertion.",
+    "throat_clearing": "🗣️ Detected throat clearing — may relate to allergy, reflux, or mild irritation.",
+    "normal": "✅ Normal breathing pattern detected — no abnormality found.",
+})
+UNCERTAIN_VERDICT = "🔍 Uncertain pattern — please retest or check mic clarity."
+
+
+def _summary_template(verdict: str, hint: str) -> str:
+    """UI summary with everything but the confidence filled in; str.format supplies that."""
+    return (
+        f"{verdict}\n\n"
+        "💡 Confidence: {:.1f}%\n"
+        f"🩺 Possible associated conditions: {hint}.\n"
+        "⚙️ Note: Prototype AI — not a medical device."
+    )
+
+
+# label -> (verdict, conditions, summary template): one lookup per request
+SUMMARY_TABLE: Mapping[str, Tuple[str, Tuple[str, ...], str]] = MappingProxyType({
+    lab: (
+        VERDICT_MAP.get(lab, UNCERTAIN_VERDICT),
+        conds,
+        _summary_template(VERDICT_MAP.get(lab, UNCERTAIN_VERDICT), DISEASE_HINTS[lab]),
+    )
+    for lab, conds in DISEASE_MAP.items()
+})
+UNKNOWN_SUMMARY = (
+    UNCERTAIN_VERDICT,
+    ("Unspecified",),
+    _summary_template(UNCERTAIN_VERDICT, "Unspecified"),
+)
+
+
+@lru_cache(maxsize=8)
+def _rebalance_vector(labels: Tuple[str, ...]) -> np.ndarray:
+    """Per-label factors aligned with the model's class order, built once per label set."""
+    return np.array([REBALANCE_FACTORS.get(lab, 1.0) for lab in labels], dtype=np.float64)
+
+
+# Strong refs so in-flight Supabase saves aren't garbage-collected before they finish
+_PENDING_SAVES: Set["asyncio.Task[Any]"] = set()
+
+
+def _on_save_done(task: "asyncio.Task[Any]") -> None:
+    _PENDING_SAVES.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Supabase save failed: {task.exception()}")
+
+
+def _file_digest(path: str) -> str:
+    """Content hash of a file, read in 1 MiB blocks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
 class AnalysisService:
     def __init__(self):
         """Initialize the analysis service with model and database services."""
         self.model_service = ModelService()
-        self.supabase_service = SupabaseService()
+        # Coalesces concurrent requests into one predict_proba call
+        self.batcher = PredictionBatcher(
+            self.model_service,
+            max_batch=settings.PREDICT_BATCH_MAX,
+            max_wait_ms=settings.PREDICT_BATCH_WAIT_MS,
+        )
+        self.supabase_service = get_supabase_service()
         self.initialized = False
+        # (upload digest, requested task_type) -> (features, resolved task_type, duration);
+        # re-uploads of the same clip skip ffmpeg, task detection and extraction
+        self._feature_cache: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], str, float]]" = OrderedDict()
         try:
             self.model_service.load_model()
             self.initialized = True
@@ -28,6 +125,106 @@ class AnalysisService:
         except Exception as e:
             logger.error(f"Failed to initialize model service: {e}")
 
+    def warm_up(self) -> None:
+        """Push one synthetic clip through extraction and the model so the first request isn't cold."""
+        if not self.initialized:
+            return
+        try:
+            rng = np.random.default_rng(0)
+            y = (0.01 * rng.standard_normal(16000)).astype(np.float32)
+            self.model_service.predict(extract_features(y, "breath", sr=16000))
+            self.model_service.memo.clear()  # don't keep the synthetic clip's row around
+            logger.info("✓ Feature pipeline and model warmed up")
+        except Exception as e:
+            logger.warning(f"Warm-up skipped: {e}")
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        cached = self._feature_cache.get(key)
+        if cached is None:
+            return None
+        self._feature_cache.move_to_end(key)
+        features, task_type, duration = cached
+        return dict(features), task_type, duration
+
+    def _cache_put(self, key: Tuple[str, str], features: Dict[str, Any], task_type: str, duration: float) -> None:
+        self._feature_cache[key] = (dict(features), task_type, duration)
+        if len(self._feature_cache) > FEATURE_CACHE_SIZE:
+            self._feature_cache.popitem(last=False)
+
+    @staticmethod
+    def _disk_cache_path(key: Tuple[str, str]) -> str:
+        digest, task_type = key
+        # Extractor version in the name: a deploy that changes the features misses old entries
+        return os.path.join(settings.ANALYSIS_CACHE_DIR, f"v{FEATURE_VERSION}_{digest}_{task_type}.pkl")
+
+    def _disk_cache_get(self, key: Tuple[str, str]) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """
+        Second tier behind the in-memory LRU (blocking; runs in a worker thread).
+        Doesn't touch the LRU itself: the caller promotes hits on the event loop.
+        """
+        path = self._disk_cache_path(key)
+        try:
+            expired = time.time() - os.path.getmtime(path) > settings.ANALYSIS_CACHE_TTL_S
+        except OSError:
+            return None
+        try:
+            if expired:
+                raise ValueError("entry past ANALYSIS_CACHE_TTL_S")
+            features, task_type, duration = joblib.load(path)
+        except Exception as e:
+            logger.info(f"Dropping feature cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return features, task_type, duration
+
+    def _disk_cache_put(self, key: Tuple[str, str], features: Dict[str, Any], task_type: str, duration: float) -> None:
+        path = self._disk_cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            joblib.dump((features, task_type, duration), tmp_path)
+            os.replace(tmp_path, path)  # atomic: readers never see a half-written entry
+        except Exception as e:
+            logger.warning(f"Feature cache write failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._disk_cache_prune()
+
+    @staticmethod
+    def _disk_cache_prune() -> None:
+        """Drop expired and other-version entries, then all but the newest MAX_ENTRIES."""
+        now = time.time()
+        prefix = f"v{FEATURE_VERSION}_"
+        keep = []
+        try:
+            with os.scandir(settings.ANALYSIS_CACHE_DIR) as it:
+                for entry in it:
+                    if not entry.name.endswith(".pkl"):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if entry.name.startswith(prefix) and now - mtime <= settings.ANALYSIS_CACHE_TTL_S:
+                        keep.append((mtime, entry.path))
+                        continue
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Feature cache prune failed: {e}")
+            return
+        if len(keep) > settings.ANALYSIS_CACHE_MAX_ENTRIES:
+            keep.sort()
+            for _, old_path in keep[:len(keep) - settings.ANALYSIS_CACHE_MAX_ENTRIES]:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
     async def analyze_audio(
         self,
         file_path: str,
@@ -52,48 +249,61 @@ class AnalysisService:
 
         try:
             start_time = time.time()
-            normalized_path, duration = normalize_audio(file_path, min_duration=min_duration)
-            start_time = time.time()
-            normalized_path, duration = normalize_audio(file_path, min_duration=min_duration)
-
-            # --- 🎛️ Auto-detect speech vs breath before extracting features ---
-            try:
-                y, sr = librosa.load(file_path, sr=16000)
-                auto_task = detect_task_type(y, sr)
-                if task_type != auto_task:
-                    logger.info(f"🎛️ Auto-switched task type: {task_type} → {auto_task}")
-                    task_type = auto_task
-            except Exception as e:
-                logger.warning(f"Auto task detection failed: {e}")
+            # Hashing reads the whole upload; keep that file I/O off the event loop too
+            cache_key = (await asyncio.to_thread(_file_digest, file_path), task_type)
+            cached = self._cache_get(cache_key)
+            if cached is None:
+                cached = await asyncio.to_thread(self._disk_cache_get, cache_key)
+                if cached is not None:
+                    # The LRU is only mutated from the loop thread, so it needs no lock
+                    self._cache_put(cache_key, *cached)
+            if cached is not None:
+                features, task_type, duration = cached
+                logger.info("♻️ Reusing cached features for identical upload")
+                if duration < min_duration:
+                    raise AudioNormalizationError(
+                        f"Audio normalization failed: Audio too short: {duration:.2f}s (minimum: {min_duration}s)"
+                    )
+            else:
+                # ffmpeg, the decode and the detectors all block; keep them off the event loop
+                # 16 kHz mono float32 straight from ffmpeg's pipe; no normalized WAV on disk
+                y, sr, duration = await asyncio.to_thread(
+                    normalize_audio, file_path, min_duration=min_duration
+                )
 
-            # --- Now continue with feature extraction ---
-            features = extract_features(normalized_path, task_type)
-            os.remove(normalized_path)
+                # --- 🎛️ Auto-detect speech vs breath before extracting features ---
+                try:
+                    # Reuse the normalized 16 kHz waveform; no second decode of the upload
+                    auto_task = await asyncio.to_thread(detect_task_type, y, sr)
+                    if task_type != auto_task:
+                        logger.info(f"🎛️ Auto-switched task type: {task_type} → {auto_task}")
+                        task_type = auto_task
+                except Exception as e:
+                    logger.warning(f"Auto task detection failed: {e}")
 
+                # --- Now continue with feature extraction ---
+                features = await asyncio.to_thread(extract_features, y, task_type, sr)
+                self._cache_put(cache_key, features, task_type, duration)
+                await asyncio.to_thread(self._disk_cache_put, cache_key, features, task_type, duration)
 
             # --- 🔍 Model prediction ---
-            predictions = self.model_service.predict(features)
+            predictions = await self.batcher.submit(features, bucket=task_type)
             class_probs = predictions.get("class_probs", {})
-            label = max(class_probs, key=class_probs.get)
-            confidence = class_probs[label]
             logger.info(f"Raw model output: {class_probs}")
 
             # --- ⚖️ Rebalance class bias ---
-            rebalance_factors = {
-                "cough": 2.5,
-                "throat_clearing": 2.2,
-                "normal": 1.0,
-                "heavy_breathing": 0.6
-            }
-            for cls, factor in rebalance_factors.items():
-                if cls in class_probs:
-                    class_probs[cls] *= factor
-            total = sum(class_probs.values())
+            labels = tuple(class_probs)
+            probs = np.fromiter(class_probs.values(), dtype=np.float64, count=len(labels))
+            probs *= _rebalance_vector(labels)
+            total = probs.sum()
             if total > 0:
-                class_probs = {k: v / total for k, v in class_probs.items()}
+                probs /= total
 
-            label = max(class_probs, key=class_probs.get)
-            confidence = class_probs[label]
+            # label/confidence come straight from the packed array; the rule blocks
+            # below only reassign them, and the dict is rebuilt once for the response
+            best = int(np.argmax(probs))
+            label = labels[best]
+            confidence = float(probs[best])
             logger.info(f"Adjusted model predicted: {label} ({confidence:.2f})")
 
             # --- Extract key acoustic features ---
@@ -123,38 +333,19 @@ class AnalysisService:
                 label = detected_type
                 confidence = max(confidence, 0.82)
 
-            # --- 🎯 Step 3: Map to likely conditions ---
-            disease_map = {
-                "cough": ["URTI", "Bronchitis", "Post-COVID irritation"],
-                "heavy_breathing": ["COPD", "Asthma", "Pneumonia"],
-                "throat_clearing": ["Post-COVID", "Allergy", "Reflux"],
-                "normal": ["Healthy"]
-            }
-            possible_conditions = disease_map.get(label.lower(), ["Unspecified"])
-
-            # --- 🩺 Step 4: Human-friendly verdict ---
-            verdict_map = {
-                "cough": "🤧 Detected cough pattern — possible bronchitis, infection, or post-COVID irritation.",
-                "heavy_breathing": "⚠️ Detected heavy breathing — may indicate asthma, COPD, or exertion.",
-                "throat_clearing": "🗣️ Detected throat clearing — may relate to allergy, reflux, or mild irritation.",
-                "normal": "✅ Normal breathing pattern detected — no abnormality found.",
-            }
-            verdict_text = verdict_map.get(label, "🔍 Uncertain pattern — please retest or check mic clarity.")
+            # --- 🎯 Step 3 + 🩺 Step 4: likely conditions and human-friendly verdict ---
+            # (labels from the model and detect_input_type are already lowercase)
+            verdict_text, possible_conditions, summary_template = SUMMARY_TABLE.get(label, UNKNOWN_SUMMARY)
 
             # --- 🧾 Step 5: Summary for UI ---
-            summary = (
-                f"{verdict_text}\n\n"
-                f"💡 Confidence: {confidence*100:.1f}%\n"
-                f"🩺 Possible associated conditions: {', '.join(possible_conditions)}.\n"
-                f"⚙️ Note: Prototype AI — not a medical device."
-            )
+            summary = summary_template.format(confidence * 100)
 
             result = {
-                "predictions": class_probs,
+                "predictions": dict(zip(labels, probs.tolist())),
                 "label": label,
                 "simplified_label": label,
                 "confidence": confidence,
-                "possible_conditions": possible_conditions,
+                "possible_conditions": list(possible_conditions),
                 "verdict": verdict_text,
                 "source": "local",
                 "processing_time": time.time() - start_time,
@@ -162,14 +353,15 @@ class AnalysisService:
                 "low_confidence": confidence < 0.75
             }
 
-            # --- 💾 Optional: Supabase Logging ---
-            try:
-                await self.supabase_service.save_analysis_result(
+            # --- 💾 Optional: Supabase Logging (off the response path) ---
+            save_task = asyncio.create_task(
+                self.supabase_service.save_analysis_result(
                     result,
                     {"file_path": file_path, "task_type": task_type, "duration": duration}
                 )
-            except Exception as e:
-                logger.warning(f"Supabase save failed: {e}")
+            )
+            _PENDING_SAVES.add(save_task)
+            save_task.add_done_callback(_on_save_done)
 
             return result
 
@@ -185,3 +377,9 @@ class AnalysisService:
                 "processing_time": 0.0,
                 "text_summary": f"❌ Analysis failed: {e}"
             }
+
+
+@lru_cache(maxsize=1)
+def get_analysis_service() -> AnalysisService:
+    """Process-wide AnalysisService; the model is loaded once, not per dependency call."""
+    return AnalysisService()
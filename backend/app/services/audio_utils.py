@@ -8,118 +8,158 @@ import tempfile
 from pathlib import Path
 import logging
 import wave
+from functools import lru_cache
 import numpy as np
+import soundfile as sf
 from typing import Optional, Tuple
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Scratch WAVs (uploads); tmpfs such as /dev/shm is opt-in via settings.AUDIO_TMP_DIR
+AUDIO_TMP_DIR: str = settings.AUDIO_TMP_DIR or tempfile.gettempdir()
+
+# Everything downstream expects 16 kHz mono
+TARGET_SR = 16000
+
 class AudioNormalizationError(Exception):
     """Custom exception for audio normalization failures."""
     pass
 
+@lru_cache(maxsize=1)
 def check_ffmpeg_available() -> bool:
-    """Check if ffmpeg is available in the system."""
+    """Check if ffmpeg is available in the system (probed once per process)."""
     try:
         subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
         return True
     except (subprocess.SubprocessError, FileNotFoundError):
         return False
 
-def get_wav_duration(file_path: str) -> float:
-    """Get the duration of a WAV file in seconds."""
+def _resample_pcm16_fallback(input_path: str) -> np.ndarray:
+    """Decode a WAV with the wave module and convert to 16kHz mono int16 (no ffmpeg)."""
+    logger.warning("FFmpeg not found, using fallback wave module")
+    with wave.open(input_path, 'rb') as wav_in:
+        # Read original audio
+        frames = wav_in.readframes(wav_in.getnframes())
+
+        # Convert to numpy array
+        audio_data = np.frombuffer(frames, dtype=np.int16)
+
+        # If stereo, convert to mono by averaging channels
+        if wav_in.getnchannels() == 2:
+            audio_data = audio_data.reshape(-1, 2).mean(axis=1)
+
+        # Resample to 16kHz if needed
+        if wav_in.getframerate() != TARGET_SR:
+            # Basic linear resampling (not ideal but works as fallback)
+            original_length = len(audio_data)
+            target_length = int(original_length * TARGET_SR / wav_in.getframerate())
+            indices = np.linspace(0, original_length-1, target_length)
+            audio_data = np.interp(indices, np.arange(original_length), audio_data)
+
+    return audio_data.astype(np.int16)
+
+
+def _decode_in_process(input_path: str) -> Optional[np.ndarray]:
+    """
+    Decode with libsndfile and bring to 16kHz mono float32 without spawning ffmpeg.
+    Returns None for containers libsndfile can't read, so the caller can fall back.
+    """
     try:
-        with wave.open(file_path, 'rb') as wav_file:
-            frames = wav_file.getnframes()
-            rate = wav_file.getframerate()
-            duration = frames / float(rate)
-            return duration
+        y, sr = sf.read(input_path, dtype='float32', always_2d=False)
     except Exception as e:
-        logger.error(f"Error getting WAV duration: {e}")
-        raise AudioNormalizationError(f"Invalid WAV file: {e}")
+        logger.debug(f"In-process decode unavailable for {input_path}: {e}")
+        return None
+    if y.ndim > 1:
+        y = y.mean(axis=1, dtype=np.float32)
+    if sr != TARGET_SR:
+        import librosa  # deferred: 16 kHz uploads never need the resampler
+        y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR).astype(np.float32, copy=False)
+    return y
+
+
+def _decode_with_ffmpeg(input_path: str) -> np.ndarray:
+    """Decode anything ffmpeg understands to 16kHz mono float32 via a raw PCM pipe."""
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(TARGET_SR),
+        '-ac', '1',
+        'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise AudioNormalizationError(
+            f"FFmpeg conversion failed: {result.stderr.decode(errors='replace')}"
+        )
+    # Same scaling libsndfile applies when reading PCM16 as float32
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
 
-def normalize_audio(input_path: str, min_duration: float = 0.5) -> Tuple[str, float]:
+def normalize_audio(input_path: str, min_duration: float = 0.5) -> Tuple[np.ndarray, int, float]:
     """
-    Normalize audio to 16kHz mono WAV format using ffmpeg.
-    Falls back to wave module if ffmpeg is not available.
-    
+    Normalize audio to a 16kHz mono float32 waveform, entirely in memory.
+    WAV/FLAC/OGG are decoded in-process with libsndfile; anything else goes
+    through ffmpeg writing raw PCM to a pipe, then the wave module if ffmpeg
+    is not available.
+
     Args:
         input_path: Path to input audio file
         min_duration: Minimum required duration in seconds
-    
+
     Returns:
-        Tuple[str, float]: (Path to normalized audio, duration in seconds)
-    
+        Tuple[np.ndarray, int, float]: (waveform in [-1, 1), sample rate, duration in seconds)
+
     Raises:
         AudioNormalizationError: If normalization fails or audio is too short
     """
     if not os.path.exists(input_path):
         raise AudioNormalizationError(f"Input file not found: {input_path}")
 
-    # Create temp file for normalized audio
-    temp_dir = tempfile.mkdtemp()
-    output_path = os.path.join(temp_dir, 'normalized.wav')
-    
     try:
-        if check_ffmpeg_available():
-            # Use ffmpeg for conversion (preferred method)
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', input_path,
-                '-acodec', 'pcm_s16le',
-                '-ar', '16000',
-                '-ac', '1',
-                output_path
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            if result.returncode != 0:
-                raise AudioNormalizationError(
-                    f"FFmpeg conversion failed: {result.stderr}"
-                )
-        else:
-            # Fallback: Use wave module for basic WAV handling
-            logger.warning("FFmpeg not found, using fallback wave module")
-            with wave.open(input_path, 'rb') as wav_in:
-                # Read original audio
-                frames = wav_in.readframes(wav_in.getnframes())
-                
-                # Convert to numpy array
-                audio_data = np.frombuffer(frames, dtype=np.int16)
-                
-                # If stereo, convert to mono by averaging channels
-                if wav_in.getnchannels() == 2:
-                    audio_data = audio_data.reshape(-1, 2).mean(axis=1)
-                
-                # Resample to 16kHz if needed
-                if wav_in.getframerate() != 16000:
-                    # Basic linear resampling (not ideal but works as fallback)
-                    original_length = len(audio_data)
-                    target_length = int(original_length * 16000 / wav_in.getframerate())
-                    indices = np.linspace(0, original_length-1, target_length)
-                    audio_data = np.interp(indices, np.arange(original_length), audio_data)
-                
-                # Write normalized audio
-                with wave.open(output_path, 'wb') as wav_out:
-                    wav_out.setnchannels(1)
-                    wav_out.setsampwidth(2)
-                    wav_out.setframerate(16000)
-                    wav_out.writeframes(audio_data.astype(np.int16).tobytes())
-
-        # Check duration
-        duration = get_wav_duration(output_path)
+        y = _decode_in_process(input_path)
+        if y is None:
+            if check_ffmpeg_available():
+                y = _decode_with_ffmpeg(input_path)
+            else:
+                y = _resample_pcm16_fallback(input_path).astype(np.float32) / 32768.0
+        duration = len(y) / float(TARGET_SR)
         if duration < min_duration:
             raise AudioNormalizationError(
                 f"Audio too short: {duration:.2f}s (minimum: {min_duration}s)"
             )
-            
+
+        return y, TARGET_SR, duration
+
+    except Exception as e:
+        raise AudioNormalizationError(f"Audio normalization failed: {str(e)}")
+
+
+def normalize_audio_to_file(input_path: str, min_duration: float = 0.5) -> Tuple[str, float]:
+    """
+    Normalize audio to a 16kHz mono WAV file on disk.
+    Callers own the returned path and must remove it.
+
+    Returns:
+        Tuple[str, float]: (Path to normalized audio, duration in seconds)
+
+    Raises:
+        AudioNormalizationError: If normalization fails or audio is too short
+    """
+    y, sr, duration = normalize_audio(input_path, min_duration=min_duration)
+
+    # A bare file, so the caller's os.remove cleans up fully
+    fd, output_path = tempfile.mkstemp(suffix='.wav', dir=AUDIO_TMP_DIR)
+    os.close(fd)
+    try:
+        with wave.open(output_path, 'wb') as wav_out:
+            wav_out.setnchannels(1)
+            wav_out.setsampwidth(2)
+            wav_out.setframerate(sr)
+            wav_out.writeframes((y * 32768.0).astype(np.int16).tobytes())
         return output_path, duration
-        
     except Exception as e:
         if os.path.exists(output_path):
             os.remove(output_path)
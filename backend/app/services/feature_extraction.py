@@ -1,60 +1,125 @@
 """
 Feature extraction module for audio analysis.
-Uses OpenSMILE for breath analysis and Whisper for speech analysis.
+Uses OpenSMILE functionals plus librosa spectral features for breath and speech analysis.
 Enhanced for reliable cough and throat-clearing detection.
 """
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
-from typing import Dict, Any, Union
+from typing import Dict, Any, Tuple, Union
 from pathlib import Path
 import librosa
+import soundfile as sf
 
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------
 # 📦 INITIALIZATION
 # ---------------------------------------------------------------------
-smile = None
-whisper = None
-
-try:
-    import opensmile
-    smile = opensmile.Smile(
-        feature_set=opensmile.FeatureSet.eGeMAPSv02,
-        feature_level=opensmile.FeatureLevel.Functionals,
-    )
+@lru_cache(maxsize=1)
+def _get_smile():
+    """Build the OpenSMILE extractor on first use so importing this module stays cheap."""
+    try:
+        import opensmile
+        smile = opensmile.Smile(
+            feature_set=opensmile.FeatureSet.eGeMAPSv02,
+            feature_level=opensmile.FeatureLevel.Functionals,
+            num_workers=1,  # API workers already run requests in parallel
+        )
+    except Exception as e:
+        logger.warning(f"Failed to load OpenSMILE: {e}")
+        raise
     logger.info("✓ OpenSMILE initialized with eGeMAPSv02 feature set")
-except Exception as e:
-    logger.warning(f"Failed to load OpenSMILE: {e}")
+    return smile
 
-try:
-    from transformers import pipeline
-    import warnings
-    warnings.filterwarnings("ignore", category=FutureWarning, module="transformers")
-    try:
-        import torch
-        has_torch = True
-    except ImportError:
-        has_torch = False
-
-    device_map = "auto" if (has_torch and hasattr(torch, "cuda") and torch.cuda.is_available()) else "cpu"
-    whisper = pipeline(
-        "automatic-speech-recognition",
-        model="openai/whisper-tiny",
-        chunk_length_s=30,
-        device=device_map
-    )
-    logger.info("✓ Whisper tiny model initialized successfully")
 
-except Exception as e:
-    logger.warning(f"Whisper not available: {e}")
-    whisper = None
+_smile_local = threading.local()
+
+
+def _smile_executor() -> ThreadPoolExecutor:
+    """
+    Single-worker OpenSMILE executor for the calling thread, created on first use and
+    reused afterwards: no thread spawned per clip, and no process-wide pool capping
+    how many requests can extract at once.
+    """
+    pool = getattr(_smile_local, "pool", None)
+    if pool is None:
+        pool = _smile_local.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="opensmile")
+    return pool
 
 
 # ---------------------------------------------------------------------
 # 🎧 FEATURE EXTRACTION
 # ---------------------------------------------------------------------
+# Bump whenever extract_features' output changes; persisted features from an older
+# extractor are then never served
+FEATURE_VERSION = 2
+
+N_FFT = 2048
+
+
+# Below this RMS (~-80 dBFS) the clip is digital silence; nothing downstream is meaningful
+SILENCE_RMS = 1e-4
+
+
+def _silent_features(duration: float) -> Dict[str, Any]:
+    """Feature dict for a silent clip: every engineered value and the model vector are zero."""
+    features: Dict[str, Any] = dict.fromkeys((
+        "rms_energy", "zero_crossing_rate", "spectral_rolloff", "spectral_centroid",
+        "cough_event_ratio", "cough_frequency_ratio", "harsh_sound_ratio",
+        "onset_rate", "energy_variation", "signal_strength",
+    ), 0.0)
+    features["duration"] = duration
+    features["model_features"] = np.zeros(120, dtype=np.float32)
+    features["n_features"] = 120
+    features["transcription"] = ""
+    return features
+
+
+@lru_cache(maxsize=8)
+def _mel_basis(sr: int, n_fft: int = N_FFT) -> np.ndarray:
+    """Mel filterbank for (sr, n_fft), built once instead of on every melspectrogram call."""
+    return librosa.filters.mel(sr=sr, n_fft=n_fft)
+
+
+@lru_cache(maxsize=8)
+def _bin_frequencies(n_bins: int) -> np.ndarray:
+    """
+    Frequency axis librosa assigns to a spectrogram passed as S= without sr:
+    fft_frequencies(sr=22050, n_fft=2*(n_bins-1)). Kept identical so the model's
+    rolloff/centroid inputs don't shift.
+    """
+    return librosa.fft_frequencies(sr=22050, n_fft=2 * (n_bins - 1))
+
+
+def _rolloff_centroid(S: np.ndarray, roll_percent: float = 0.85) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-frame spectral rolloff and centroid from one cumulative sum over S.
+    Matches librosa.feature.spectral_rolloff(S=S) / spectral_centroid(S=S).
+    """
+    freq = _bin_frequencies(S.shape[0])
+    cum = np.cumsum(S, axis=0)
+    total = cum[-1]
+    # First bin whose cumulative energy reaches roll_percent of the frame total
+    rolloff = freq[np.argmax(cum >= roll_percent * total, axis=0)]
+    # librosa's normalize() leaves near-zero columns unscaled instead of dividing by ~0
+    denom = np.where(total < np.finfo(S.dtype).tiny, 1.0, total)
+    centroid = (freq @ S) / denom
+    return rolloff, centroid
+
+
+@lru_cache(maxsize=8)
+def _band_slices(sr: int, n_fft: int = N_FFT) -> Tuple[slice, slice, slice]:
+    """STFT row ranges for <=500 Hz, 500-2000 Hz and >2000 Hz (bins are sorted, so slices are views)."""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    i_low = int(np.searchsorted(freqs, 500, side="right"))
+    i_mid = int(np.searchsorted(freqs, 2000, side="right"))
+    return slice(0, i_low), slice(i_low, i_mid), slice(i_mid, None)
+
+
 def extract_features(source: Union[str, Path, np.ndarray], task_type: str = "breath", sr: int = 16000) -> Dict[str, Any]:
     """
     Extracts robust audio features for respiratory or speech classification.
@@ -66,14 +131,28 @@ def extract_features(source: Union[str, Path, np.ndarray], task_type: str = "bre
         # Load and normalize waveform
         # --------------------------------------------------------------
         if isinstance(source, (str, Path)):
-            y, sr = librosa.load(str(source), sr=16000)
+            # libsndfile decodes straight into one float32 array; resample only if needed
+            y, sr = sf.read(str(source), dtype="float32", always_2d=False)
+            if y.ndim > 1:
+                y = y.mean(axis=1)
+            if sr != 16000:
+                y = librosa.resample(y, orig_sr=sr, target_sr=16000)
+                sr = 16000
         elif isinstance(source, np.ndarray):
-            y = source.astype(np.float32)
+            # normalize_audio already hands over float32; only convert (and copy) other dtypes.
+            # Nothing below writes into y in place, so the caller's buffer is safe to share.
+            y = np.asarray(source, dtype=np.float32)
         else:
             raise ValueError(f"Unsupported audio source type: {type(source)}")
 
         logger.info(f"extract_features received input (sr={sr})")
 
+        # One dot-product reduction decides whether any of the work below is worth doing
+        signal_rms = float(np.sqrt(np.dot(y, y) / max(len(y), 1)))
+        if signal_rms < SILENCE_RMS:
+            logger.info(f"🔇 Near-silent input (rms={signal_rms:.2e}) → skipping feature extraction")
+            return _silent_features(len(y) / sr)
+
         rms = np.mean(librosa.feature.rms(y=y))
         if rms > 0.1:
             y = y / (1 + rms * 5)
@@ -82,63 +161,79 @@ def extract_features(source: Union[str, Path, np.ndarray], task_type: str = "bre
         # --------------------------------------------------------------
         # OpenSMILE features
         # --------------------------------------------------------------
-        import soundfile as sf, tempfile
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
-            sf.write(tmp.name, y, sr)
-            smile_features = smile.process_file(tmp.name)
-        opensmile_features = smile_features.values.flatten()
-        logger.info(f"OpenSMILE features shape: {opensmile_features.shape}")
-
-        # --------------------------------------------------------------
-        # Basic spectral & energy features
-        # --------------------------------------------------------------
-        features["duration"] = len(y) / sr
-        features["rms_energy"] = np.sqrt(np.mean(y ** 2))
-        features["zero_crossing_rate"] = np.mean(librosa.feature.zero_crossing_rate(y))
-        mel_spec = librosa.feature.melspectrogram(y=y, sr=sr)
-        features["spectral_rolloff"] = np.mean(librosa.feature.spectral_rolloff(S=mel_spec))
-        features["spectral_centroid"] = np.mean(librosa.feature.spectral_centroid(S=mel_spec))
-
-        # --------------------------------------------------------------
-        # Cough/Throat detection engineered features
-        # --------------------------------------------------------------
-        y_norm = y / (np.max(np.abs(y)) + 1e-8)
-        energy_env = librosa.feature.rms(y=y, frame_length=512, hop_length=256)[0]
-        energy_thr = np.mean(energy_env) + 2 * np.std(energy_env)
-        cough_events = energy_env > energy_thr
-        cough_ratio = np.sum(cough_events) / len(cough_events)
-
-        freqs = librosa.fft_frequencies(sr=sr)
-        stft = np.abs(librosa.stft(y))
-        total_e = np.mean(stft) + 1e-8
-        low = np.mean(stft[freqs <= 500]) / total_e
-        mid = np.mean(stft[(freqs > 500) & (freqs <= 2000)]) / total_e
-        high = np.mean(stft[freqs > 2000]) / total_e
-
-        cough_freq_ratio = mid / (low + 1e-8)
-        harsh_ratio = high / (low + 1e-8)
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units="frames")
-        onset_rate = len(onset_frames) / (len(y) / sr)
-        energy_var = np.std(energy_env) / (np.mean(energy_env) + 1e-8)
-        signal_strength = np.mean(np.abs(y))
-
-        features.update({
-            "cough_event_ratio": cough_ratio,
-            "cough_frequency_ratio": cough_freq_ratio,
-            "harsh_sound_ratio": harsh_ratio,
-            "onset_rate": onset_rate,
-            "energy_variation": energy_var,
-            "signal_strength": signal_strength
-        })
-
-        logger.info(
-            f"Cough indicators: ratio={cough_ratio:.3f}, freq={cough_freq_ratio:.3f}, "
-            f"harsh={harsh_ratio:.3f}, onset={onset_rate:.3f}, energy_var={energy_var:.3f}"
-        )
+        # Feed the decoded waveform directly; no temp WAV write + re-read.
+        # OpenSMILE's C core releases the GIL, so it runs on this worker thread's helper
+        # while the librosa features below are computed.
+        smile_future = _smile_executor().submit(_get_smile().process_signal, y, sr)
+        try:
+            # --------------------------------------------------------------
+            # Basic spectral & energy features
+            # --------------------------------------------------------------
+            features["duration"] = len(y) / sr
+            features["rms_energy"] = np.sqrt(np.mean(y ** 2))
+            features["zero_crossing_rate"] = np.mean(librosa.feature.zero_crossing_rate(y))
+            # Single STFT reused for the mel spectrogram and the band-energy ratios below
+            stft = np.abs(librosa.stft(y, n_fft=N_FFT))
+            mel_spec = _mel_basis(sr) @ (stft ** 2)
+            rolloff, centroid = _rolloff_centroid(mel_spec)
+            features["spectral_rolloff"] = float(rolloff.mean())
+            features["spectral_centroid"] = float(centroid.mean())
+
+            # --------------------------------------------------------------
+            # Cough/Throat detection engineered features
+            # --------------------------------------------------------------
+            energy_env = librosa.feature.rms(y=y, frame_length=512, hop_length=256)[0]
+            # Envelope moments feed both the event threshold and energy_variation
+            env_mean = float(energy_env.mean())
+            env_std = float(energy_env.std())
+            energy_thr = env_mean + 2 * env_std
+            cough_events = energy_env > energy_thr
+            cough_ratio = np.sum(cough_events) / len(cough_events)
+
+            low_band, mid_band, high_band = _band_slices(sr)
+            total_e = np.mean(stft) + 1e-8
+            low = np.mean(stft[low_band]) / total_e
+            mid = np.mean(stft[mid_band]) / total_e
+            high = np.mean(stft[high_band]) / total_e
+
+            cough_freq_ratio = mid / (low + 1e-8)
+            harsh_ratio = high / (low + 1e-8)
+            # Same envelope onset_detect(y=...) would build, but from the mel spectrogram we already have
+            onset_env = librosa.onset.onset_strength(S=librosa.power_to_db(mel_spec), sr=sr)
+            onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, units="frames")
+            onset_rate = len(onset_frames) / (len(y) / sr)
+            energy_var = env_std / (env_mean + 1e-8)
+            signal_strength = np.mean(np.abs(y))
+
+            features.update({
+                "cough_event_ratio": cough_ratio,
+                "cough_frequency_ratio": cough_freq_ratio,
+                "harsh_sound_ratio": harsh_ratio,
+                "onset_rate": onset_rate,
+                "energy_variation": energy_var,
+                "signal_strength": signal_strength
+            })
+
+            logger.info(
+                f"Cough indicators: ratio={cough_ratio:.3f}, freq={cough_freq_ratio:.3f}, "
+                f"harsh={harsh_ratio:.3f}, onset={onset_rate:.3f}, energy_var={energy_var:.3f}"
+            )
+
+            smile_frame = smile_future.result()
+        finally:
+            # If the librosa section failed, don't leave the OpenSMILE job running unobserved
+            if not smile_future.cancel():
+                smile_exc = smile_future.exception()
+                if smile_exc is not None:
+                    logger.warning(f"OpenSMILE extraction failed: {smile_exc}")
 
         # --------------------------------------------------------------
         # Compose final 120-D feature vector
         # --------------------------------------------------------------
+        # One 88-wide row; cast to float32 on the way out of pandas instead of copying float64
+        opensmile_features = smile_frame.to_numpy(dtype=np.float32).ravel()
+        logger.info(f"OpenSMILE features shape: {opensmile_features.shape}")
+
         basic = np.array([
             features["rms_energy"],
             features["zero_crossing_rate"],
@@ -158,7 +253,10 @@ def extract_features(source: Union[str, Path, np.ndarray], task_type: str = "bre
         elif len(combined) > 120:
             combined = combined[:120]
 
-        features["model_features"] = (combined - np.mean(combined)) / (np.std(combined) + 1e-6)
+        # Standardise in float64, then hand out the contiguous float32 row the forest scores on
+        features["model_features"] = np.ascontiguousarray(
+            (combined - np.mean(combined)) / (np.std(combined) + 1e-6), dtype=np.float32
+        )
         features["n_features"] = 120
         features["transcription"] = ""
 
@@ -221,26 +319,32 @@ def detect_task_type(y: np.ndarray, sr: int = 16000) -> str:
     Uses energy, zero-crossing rate, and onset stats.
     """
     try:
+        # Frame RMS and ZCR are cheap; the onset detector (STFT + mel) is only
+        # consulted when it can still change the answer, i.e. the clip looks like speech.
         rms = librosa.feature.rms(y=y)[0]
         zcr = librosa.feature.zero_crossing_rate(y)[0]
         energy_var = np.std(rms) / (np.mean(rms) + 1e-8)
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units="frames")
-        onset_rate = len(onset_frames) / (len(y) / sr)
 
-        if energy_var > 0.8 or onset_rate > 1.5:
-            logger.info(f"🌬️ Detected cough-like sound (energy={energy_var:.2f}, onset={onset_rate:.2f}) → breath")
+        if energy_var > 0.8:
+            logger.info(f"🌬️ Detected cough-like sound (energy={energy_var:.2f}) → breath")
             return "breath"
 
         voiced_ratio = np.mean(rms > np.mean(rms) * 1.2)
         zcr_mean = np.mean(zcr)
 
-        if voiced_ratio > 0.4 and zcr_mean > 0.15 and voiced_ratio < 0.85:
-            logger.info(f"🗣️ Detected probable speech (voiced_ratio={voiced_ratio:.2f}, zcr={zcr_mean:.3f})")
-            return "speech"
-        else:
+        if not (voiced_ratio > 0.4 and zcr_mean > 0.15 and voiced_ratio < 0.85):
             logger.info(f"🌬️ Detected probable breath (voiced_ratio={voiced_ratio:.2f}, zcr={zcr_mean:.3f})")
             return "breath"
 
+        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units="frames")
+        onset_rate = len(onset_frames) / (len(y) / sr)
+        if onset_rate > 1.5:
+            logger.info(f"🌬️ Detected cough-like sound (energy={energy_var:.2f}, onset={onset_rate:.2f}) → breath")
+            return "breath"
+
+        logger.info(f"🗣️ Detected probable speech (voiced_ratio={voiced_ratio:.2f}, zcr={zcr_mean:.3f})")
+        return "speech"
+
     except Exception as e:
         logger.warning(f"Task-type detection failed, defaulting to breath: {e}")
         return "breath"
@@ -3,9 +3,11 @@ import logging
 import joblib
 import json
 import numpy as np
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
 import warnings
 from ..core.config import settings
+from .prediction_memo import PredictionMemo
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,12 +17,36 @@ class ModelLoadError(Exception):
     pass
 
 
+RESPIRATORY_LABELS = (
+    "Asthma",
+    "Bronchiectasis",
+    "Bronchiolitis",
+    "COPD",
+    "LRTI",
+    "Pneumonia",
+    "URTI",
+)
+
+
+@lru_cache(maxsize=16)
+def _load_label_map(path: str, mtime: float) -> Dict[int, str]:
+    """Parse label_map.json once per (path, mtime); a rewritten file gets a new key."""
+    with open(path, "r") as f:
+        label_map = json.load(f)
+    return {int(k): v for k, v in label_map.items()}
+
+
 class ModelService:
     """Service to manage ML model loading and inference."""
 
     def __init__(self):
         self.model: Optional[Any] = None
         self.inv_label_map: Dict[int, str] = {}
+        self.label_to_idx: Dict[str, int] = {}
+        self.healthy_idx: Optional[int] = None
+        self.resp_indices: np.ndarray = np.empty(0, dtype=np.intp)
+        # Raw predict_proba rows for bit-identical feature vectors
+        self.memo = PredictionMemo()
 
     # -------------------------------------------------------
     def load_model(self) -> None:
@@ -34,25 +60,45 @@ class ModelService:
             with warnings.catch_warnings():
                 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
                 self.model = joblib.load(settings.MODEL_PATH)
+            self.memo.clear()  # rows memoized against a previous model are stale
+            # Serving scores one row at a time; fanning 100 trees out to a thread pool
+            # per call costs more than walking them inline.
+            if hasattr(self.model, "n_jobs"):
+                self.model.n_jobs = 1
             logger.info(f"✓ Loaded model from {settings.MODEL_PATH}")
 
             # readable names from JSON, numeric order from model
-            with open(settings.LABEL_MAP_PATH, "r") as f:
-                label_map = json.load(f)
-            self.inv_label_map = {int(k): v for k, v in label_map.items()}
+            self.inv_label_map = dict(
+                _load_label_map(settings.LABEL_MAP_PATH, os.path.getmtime(settings.LABEL_MAP_PATH))
+            )
             logger.info(f"✓ Using readable label map: {self.inv_label_map}")
+            self._index_labels()
 
         except Exception as e:
             raise ModelLoadError(f"Failed to load model: {e}")
 
+    def _index_labels(self) -> None:
+        """Reverse label lookups used on every prediction, built once per load."""
+        self.label_to_idx = {v: i for i, v in self.inv_label_map.items()}
+        self.healthy_idx = self.label_to_idx.get("Healthy")
+        # Integer index array so the cough redistribution is one fancy-indexed add
+        self.resp_indices = np.array(
+            [self.label_to_idx[lab] for lab in RESPIRATORY_LABELS if lab in self.label_to_idx],
+            dtype=np.intp,
+        )
+
     # -------------------------------------------------------
     def predict(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Predict with adaptive normalisation and sanity correction."""
+        return self.predict_batch([features])[0]
+
+    def predict_batch(self, features_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score several feature dicts with one predict_proba over the stacked rows."""
         if self.model is None:
             raise ModelLoadError("Model not loaded. Call load_model() first.")
         try:
-            fv = self._prepare_features(features)
-            fv = np.asarray(fv, dtype=float)
+            # sklearn forests cast inputs to float32 internally; hand it float32 directly
+            X = np.stack([self._prepare_features(f) for f in features_list])
 
             # ---- microphone/scale normalisation ----
             # Temporarily disabled to fix bias - features are already normalized in training
@@ -61,36 +107,50 @@ class ModelService:
             # fv = (fv - fv.mean()) / (fv.std() + 1e-6)
             # ----------------------------------------
 
-            pred_proba = self.model.predict_proba([fv])[0]
-            pred_class = int(self.model.predict([fv])[0])
-            adjusted = self._adjust_predictions_with_cough_indicators(
-                features, pred_proba.copy()
-            )
-            adjusted /= np.sum(adjusted)
+            # Only rows not already scored (exact feature match) go through the forest;
+            # the cough-indicator adjustment below still runs on every request's own features
+            pred_proba: List[Optional[np.ndarray]] = [self.memo.get(x) for x in X]
+            misses = [i for i, row in enumerate(pred_proba) if row is None]
+            if misses:
+                fresh = self.model.predict_proba(X[misses])
+                for i, row in zip(misses, fresh):
+                    pred_proba[i] = row
+                    self.memo.put(X[i], row)
+
+            return [
+                self._finalize_prediction(features, row)
+                for features, row in zip(features_list, pred_proba)
+            ]
 
-            confidence = float(np.max(adjusted))
-            predicted_idx = int(np.argmax(adjusted))
-            predicted_label = self.inv_label_map.get(predicted_idx, "Unknown")
+        except Exception as e:
+            logger.error(f"Prediction failed: {e}")
+            raise
 
-            # Use direct argmax for predicted_class - no arbitrary remapping
-            class_probs = {
-                self.inv_label_map.get(i, f"class_{i}"): float(p)
-                for i, p in enumerate(adjusted)
-            }
+    def _finalize_prediction(self, features: Dict[str, Any], pred_proba: np.ndarray) -> Dict[str, Any]:
+        adjusted = self._adjust_predictions_with_cough_indicators(
+            features, pred_proba.copy()
+        )
+        adjusted /= np.sum(adjusted)
 
-            logger.info(
-                f"Predicted: {predicted_label} ({confidence:.3f})"
-            )
+        predicted_idx = int(np.argmax(adjusted))
+        confidence = float(adjusted[predicted_idx])
+        predicted_label = self.inv_label_map.get(predicted_idx, "Unknown")
 
-            return {
-                "predicted_class": predicted_label,
-                "confidence": confidence,
-                "class_probs": class_probs,
-            }
+        # Use direct argmax for predicted_class - no arbitrary remapping
+        class_probs = {
+            self.inv_label_map.get(i, f"class_{i}"): float(p)
+            for i, p in enumerate(adjusted)
+        }
 
-        except Exception as e:
-            logger.error(f"Prediction failed: {e}")
-            raise
+        logger.info(
+            f"Predicted: {predicted_label} ({confidence:.3f})"
+        )
+
+        return {
+            "predicted_class": predicted_label,
+            "confidence": confidence,
+            "class_probs": class_probs,
+        }
 
     # -------------------------------------------------------
     def _adjust_predictions_with_cough_indicators(
@@ -121,32 +181,15 @@ class ModelService:
             )
             normal_score = float(min(normal_score, 1.0))
 
-            healthy_idx = next(
-                (i for i, v in self.inv_label_map.items() if v == "Healthy"), None
-            )
+            healthy_idx = self.healthy_idx
 
             if cough_score >= 0.85 and healthy_idx is not None:
                 healthy_prob = probs[healthy_idx]
                 probs[healthy_idx] = healthy_prob * 0.8
                 redistribute = healthy_prob * 0.2
-                resp_indices = [
-                    i
-                    for i, v in self.inv_label_map.items()
-                    if v
-                    in [
-                        "Asthma",
-                        "Bronchiectasis",
-                        "Bronchiolitis",
-                        "COPD",
-                        "LRTI",
-                        "Pneumonia",
-                        "URTI",
-                    ]
-                ]
-                if resp_indices:
-                    inc = redistribute / len(resp_indices)
-                    for i in resp_indices:
-                        probs[i] += inc
+                resp_indices = self.resp_indices
+                if resp_indices.size:
+                    probs[resp_indices] += redistribute / resp_indices.size
                 logger.info(f"Cough detected ({cough_score:.2f}) – mild redistribution")
 
             elif normal_score >= 0.8 and healthy_idx is not None:
@@ -164,7 +207,7 @@ class ModelService:
     def _prepare_features(self, features: Dict[str, Any]) -> np.ndarray:
         if "model_features" not in features:
             raise ValueError("model_features missing in request")
-        fv = np.array(features["model_features"], dtype=float)
+        fv = np.asarray(features["model_features"], dtype=np.float32)
         if fv.ndim > 1:
             fv = fv.flatten()
         if len(fv) < 120:
@@ -0,0 +1,98 @@
+"""
+Micro-batcher for model predictions.
+Concurrent analyses queue their feature dicts here, bucketed by task type; one
+worker per bucket drains its queue and scores each batch with a single
+ModelService.predict_batch call.
+"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:  # annotation only; any object with predict_batch works
+    from .model_service import ModelService
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionBatcher:
+    def __init__(self, model_service: "ModelService", max_batch: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            model_service: Loaded model wrapper that exposes predict_batch
+            max_batch: Upper bound on rows scored per predict_proba call
+            max_wait_ms: How long the first queued request waits for company
+        """
+        self.model_service = model_service
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        # bucket -> queue / worker; breath and speech clips are never mixed in one batch
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    def _ensure_worker(self, bucket: str) -> asyncio.Queue:
+        # Created lazily so queues bind to the running event loop, not import time
+        queue = self._queues.get(bucket)
+        if queue is None:
+            queue = self._queues[bucket] = asyncio.Queue()
+        worker = self._workers.get(bucket)
+        if worker is None or worker.done():
+            self._workers[bucket] = asyncio.get_running_loop().create_task(self._run(queue))
+        return queue
+
+    async def submit(self, features: Dict[str, Any], bucket: str = "default") -> Dict[str, Any]:
+        """Queue one feature dict in the given bucket and wait for its prediction."""
+        queue = self._ensure_worker(bucket)
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((features, future))
+        return await future
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await self._collect(queue)
+            # Requests whose callers were cancelled while queued are not scored
+            batch = [(f, fut) for f, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            feats = [f for f, _ in batch]
+            try:
+                outcomes = [(True, r) for r in await asyncio.to_thread(self.model_service.predict_batch, feats)]
+            except Exception as e:
+                if len(batch) == 1:
+                    outcomes = [(False, e)]
+                else:
+                    # One bad row must not fail its neighbours: rescore row by row
+                    logger.warning(f"Batch of {len(batch)} failed ({e}); retrying rows individually")
+                    outcomes = await asyncio.to_thread(self._score_rows, feats)
+            if len(batch) > 1:
+                logger.debug(f"Scored batch of {len(batch)} predictions")
+            for (_, fut), (ok, value) in zip(batch, outcomes):
+                if fut.done():
+                    continue
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(value)
+
+    def _score_rows(self, feats: List[Dict[str, Any]]) -> List[Tuple[bool, Any]]:
+        """(ok, result-or-exception) per row, each scored on its own (blocking)."""
+        outcomes: List[Tuple[bool, Any]] = []
+        for f in feats:
+            try:
+                outcomes.append((True, self.model_service.predict_batch([f])[0]))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
@@ -0,0 +1,55 @@
+"""
+Exact-match memo for raw model probabilities.
+Keyed on a digest of the float32 model_features bytes, so a stored row is
+only ever returned for a bit-identical feature vector.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+MEMO_SIZE = 1024
+
+
+class PredictionMemo:
+    def __init__(self, size: int = MEMO_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # Bucket workers call predict_batch from different threads concurrently
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(x: np.ndarray) -> bytes:
+        row = np.ascontiguousarray(x, dtype=np.float32)
+        return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, x: np.ndarray) -> Optional[np.ndarray]:
+        key = self._key(x)
+        with self._lock:
+            probs = self._entries.get(key)
+            if probs is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probs.copy()
+
+    def put(self, x: np.ndarray, probs: np.ndarray) -> None:
+        key = self._key(x)
+        with self._lock:
+            self._entries[key] = np.array(probs, copy=True)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -2,7 +2,9 @@
 Supabase service for storing analysis results and user data.
 """
 import os
+import asyncio
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from datetime import datetime
 import uuid
@@ -17,6 +19,9 @@ class SupabaseService:
     def __init__(self):
         self.client = None
         self.connected = False
+        # Credentials don't change at runtime; snapshot what the health check reports
+        self._status_url = settings.SUPABASE_URL[:30] + "..." if settings.SUPABASE_URL else None
+        self._has_credentials = bool(settings.SUPABASE_URL and settings.SUPABASE_KEY)
         self._initialize_client()
     
     def _initialize_client(self):
@@ -45,6 +50,10 @@ class SupabaseService:
         except Exception as e:
             logger.error(f"❌ Failed to initialize Supabase client: {e}")
     
+    async def _execute(self, query):
+        """Run a blocking postgrest query off the event loop, reusing the shared client."""
+        return await asyncio.to_thread(query.execute)
+
     async def save_analysis_result(
         self, 
         analysis_result: Dict[str, Any],
@@ -113,7 +122,7 @@ class SupabaseService:
             }
             
             # Insert into analysis_history table
-            result = self.client.table("analysis_history").insert(record).execute()
+            result = await self._execute(self.client.table("analysis_history").insert(record))
             
             if result.data:
                 record_id = result.data[0]["id"]
@@ -151,12 +160,13 @@ class SupabaseService:
             return {"status": "offline", "data": []}
         
         try:
-            result = self.client.table("analysis_history")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .order("created_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            result = await self._execute(
+                self.client.table("analysis_history")
+                .select("*")
+                .eq("user_id", user_id)
+                .order("created_at", desc=True)
+                .limit(limit)
+            )
             
             return {
                 "status": "success",
@@ -218,7 +228,7 @@ class SupabaseService:
                     "is_resolved": False
                 }
                 
-                result = self.client.table("alerts").insert(alert_record).execute()
+                result = await self._execute(self.client.table("alerts").insert(alert_record))
                 
                 if result.data:
                     alert_id = result.data[0]["id"]
@@ -244,6 +254,12 @@ class SupabaseService:
         """Get the current connection status."""
         return {
             "connected": self.connected,
-            "url": settings.SUPABASE_URL[:30] + "..." if settings.SUPABASE_URL else None,
-            "has_credentials": bool(settings.SUPABASE_URL and settings.SUPABASE_KEY)
+            "url": self._status_url,
+            "has_credentials": self._has_credentials
         }
+
+
+@lru_cache(maxsize=1)
+def get_supabase_service() -> SupabaseService:
+    """Shared SupabaseService so every caller reuses one client and its connection pool."""
+    return SupabaseService()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service modules as `app.*`, the same way uvicorn loads them from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
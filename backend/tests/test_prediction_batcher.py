@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.prediction_batcher import PredictionBatcher
+
+
+class FakeModelService:
+    """predict_batch echoes each row's id and fails the whole call on a malformed row."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def predict_batch(self, features_list):
+        with self._lock:
+            self.calls.append([(f.get("bucket"), f.get("id")) for f in features_list])
+        for f in features_list:
+            if "model_features" not in f:
+                raise ValueError(f"model_features missing in request {f.get('id')}")
+        return [{"predicted_class": f"class_{f['id']}", "id": f["id"]} for f in features_list]
+
+
+async def _submit_all(batcher, requests):
+    return await asyncio.gather(
+        *(batcher.submit(features, bucket=features["bucket"]) for features in requests),
+        return_exceptions=True,
+    )
+
+
+def test_bad_row_only_fails_its_own_request():
+    model = FakeModelService()
+    batcher = PredictionBatcher(model, max_batch=16, max_wait_ms=50)
+    requests = [{"id": i, "bucket": "breath", "model_features": [0.0]} for i in range(6)]
+    del requests[3]["model_features"]
+
+    results = asyncio.run(_submit_all(batcher, requests))
+
+    for i, result in enumerate(results):
+        if i == 3:
+            assert isinstance(result, ValueError)
+        else:
+            assert result == {"predicted_class": f"class_{i}", "id": i}
+    # The first attempt scored every row together, then each row was retried on its own
+    assert len(model.calls[0]) == 6
+
+
+def test_buckets_are_never_mixed():
+    model = FakeModelService()
+    batcher = PredictionBatcher(model, max_batch=16, max_wait_ms=50)
+    requests = [
+        {"id": i, "bucket": "breath" if i % 2 else "speech", "model_features": [0.0]}
+        for i in range(10)
+    ]
+
+    results = asyncio.run(_submit_all(batcher, requests))
+
+    assert [r["id"] for r in results] == list(range(10))
+    for call in model.calls:
+        assert len({bucket for bucket, _ in call}) == 1
+    assert sum(len(call) for call in model.calls) == 10
+
+
+def test_batch_size_is_capped():
+    model = FakeModelService()
+    batcher = PredictionBatcher(model, max_batch=3, max_wait_ms=50)
+    requests = [{"id": i, "bucket": "breath", "model_features": [0.0]} for i in range(7)]
+
+    results = asyncio.run(_submit_all(batcher, requests))
+
+    assert [r["id"] for r in results] == list(range(7))
+    assert max(len(call) for call in model.calls) <= 3
+
+
+@pytest.mark.parametrize("max_batch", [1, 8])
+def test_single_bad_request_raises(max_batch):
+    batcher = PredictionBatcher(FakeModelService(), max_batch=max_batch, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        asyncio.run(batcher.submit({"id": 0, "bucket": "breath"}, bucket="breath"))
@@ -0,0 +1,57 @@
+import csv
+import os
+
+import numpy as np
+
+from app.services.prediction_memo import PredictionMemo
+
+FEATURES_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "features.csv")
+
+
+def _standardised_rows(n):
+    """First n recordings from the training feature table, z-scored the way extract_features does."""
+    rows = []
+    with open(FEATURES_CSV, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for record in reader:
+            v = np.asarray(record[2:], dtype=np.float64)
+            rows.append(np.ascontiguousarray((v - v.mean()) / (v.std() + 1e-6), dtype=np.float32))
+            if len(rows) == n:
+                break
+    return rows
+
+
+def test_distinct_clips_do_not_share_an_entry():
+    memo = PredictionMemo()
+    clips = _standardised_rows(50)
+    for i, x in enumerate(clips):
+        probs = np.zeros(len(clips))
+        probs[i] = 1.0
+        memo.put(x, probs)
+
+    assert memo.stats()["entries"] == len(clips)
+    for i, x in enumerate(clips):
+        assert int(np.argmax(memo.get(x))) == i
+
+
+def test_only_identical_vectors_hit():
+    memo = PredictionMemo()
+    x = _standardised_rows(1)[0]
+    memo.put(x, np.array([0.2, 0.8]))
+
+    nudged = x.copy()
+    nudged[0] = np.nextafter(nudged[0], np.float32(np.inf))
+    assert memo.get(nudged) is None
+    np.testing.assert_array_equal(memo.get(x.copy()), [0.2, 0.8])
+
+
+def test_lru_eviction():
+    memo = PredictionMemo(size=2)
+    a, b, c = _standardised_rows(3)
+    memo.put(a, np.array([1.0]))
+    memo.put(b, np.array([2.0]))
+    memo.get(a)
+    memo.put(c, np.array([3.0]))
+    assert memo.get(b) is None
+    assert memo.get(a) is not None and memo.get(c) is not None
@@ -2,14 +2,18 @@
 import os
 import sys
 import json
+import hashlib
 import argparse
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple, List, Dict, Optional
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+from scipy.signal import savgol_filter
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.utils.class_weight import compute_class_weight
 from sklearn.metrics import accuracy_score, classification_report
@@ -30,12 +34,24 @@ except Exception:
     HAVE_OPENSMILE = False
     warnings.warn("opensmile not found. Falling back to librosa-based features.")
 
+# numba ships with librosa; keep a NumPy path in case it is missing
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except Exception:
+    HAVE_NUMBA = False
+
 # ----------------------------
 # Constants / Defaults
 # ----------------------------
 N_FEATURES_EXPECTED = 120
 MODEL_OUT_PATH = Path("backend/ml/models/model_rf.pkl")
+HGB_MODEL_OUT_PATH = Path("backend/ml/models/model_hgb.pkl")
 LABEL_MAP_OUT_PATH = Path("backend/ml/models/label_map.json")
+FEATURE_CACHE_DIR = Path("backend/data/feature_cache")
+# Bump whenever extract_features_file's output changes; cached vectors from an
+# older extractor then miss instead of being silently trained on
+TRAIN_FEATURE_VERSION = 2
 
 # Default dataset locations to auto-detect
 DEFAULT_DATASET_HINTS = [
@@ -68,15 +84,17 @@ def find_dataset_path(user_path: Optional[str]) -> Path:
         return p
 
     for base in DEFAULT_DATASET_HINTS:
-        for csv_name in ["features.csv", "data.csv", "train.csv"]:
+        for csv_name in ["features.npz", "features.csv", "data.csv", "train.csv"]:
             p = (base / csv_name).resolve()
-            if p.exists() and p.suffix.lower() == ".csv":
+            if p.exists() and p.suffix.lower() in (".csv", ".npz"):
                 return p
         if base.exists() and base.is_dir():
-            subdirs = [d for d in base.iterdir() if d.is_dir()]
-            if subdirs:
-                for d in subdirs:
-                    if any((d / f).suffix.lower() in AUDIO_EXTS for f in os.listdir(d) if (d / f).is_file()):
+            # scandir entries carry their file type, so no stat() per candidate file
+            with os.scandir(base) as it:
+                subdirs = [e.path for e in it if e.is_dir()]
+            for d in subdirs:
+                with os.scandir(d) as it:
+                    if any(e.is_file() and os.path.splitext(e.name)[1].lower() in AUDIO_EXTS for e in it):
                         return base
     raise FileNotFoundError("Could not auto-detect dataset. Please pass --data PATH.")
 
@@ -85,16 +103,29 @@ def is_csv_dataset(path: Path) -> bool:
     return path.is_file() and path.suffix.lower() == ".csv"
 
 
+def is_npz_dataset(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() == ".npz"
+
+
+def is_npy_dataset(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() == ".npy"
+
+
 def list_audio_files_by_class(root: Path) -> Dict[str, List[Path]]:
     classes = {}
-    for cls_dir in sorted([d for d in root.iterdir() if d.is_dir()]):
+    # os.scandir/os.walk reuse the directory entry type, avoiding a stat() per file
+    with os.scandir(root) as it:
+        class_dirs = sorted(Path(e.path) for e in it if e.is_dir())
+    for cls_dir in class_dirs:
         # Only include allowed acoustic classes
         if cls_dir.name not in ALLOWED_CLASSES:
             continue
-        audio_files = []
-        for f in sorted(cls_dir.rglob("*")):
-            if f.is_file() and f.suffix.lower() in AUDIO_EXTS:
-                audio_files.append(f)
+        audio_files = sorted(
+            Path(dirpath) / name
+            for dirpath, _, filenames in os.walk(cls_dir)
+            for name in filenames
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTS
+        )
         if audio_files:
             classes[cls_dir.name] = audio_files
     if not classes:
@@ -105,49 +136,80 @@ def list_audio_files_by_class(root: Path) -> Dict[str, List[Path]]:
 # ----------------------------
 # Feature Extraction
 # ----------------------------
+@lru_cache(maxsize=1)
+def _get_smile():
+    # One Smile per (worker) process instead of one per file
+    return opensmile.Smile(
+        feature_set=opensmile.FeatureSet.eGeMAPSv02,
+        feature_level=opensmile.FeatureLevel.Functionals,
+    )
+
+
 def extract_opensmile_features_audio(y: np.ndarray, sr: int) -> np.ndarray:
     if not HAVE_OPENSMILE:
         raise RuntimeError("OpenSMILE not available.")
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmpf:
-        sf.write(tmpf.name, y, sr)
-        smile = opensmile.Smile(
-            feature_set=opensmile.FeatureSet.eGeMAPSv02,
-            feature_level=opensmile.FeatureLevel.Functionals,
-        )
-        feats = smile.process_file(tmpf.name)
-        vec = feats.iloc[0].values.astype(np.float32)
-    return vec
+    feats = _get_smile().process_signal(y, sr)
+    return feats.to_numpy(dtype=np.float32)[0]
+
+
+def _row_mean_std_numpy(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return x.mean(axis=1), x.std(axis=1)
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _row_mean_std(x):
+        # Welford: per-row mean and population std in a single sweep
+        n_rows, n_cols = x.shape
+        mean = np.empty(n_rows)
+        std = np.empty(n_rows)
+        for i in range(n_rows):
+            m = 0.0
+            m2 = 0.0
+            for j in range(n_cols):
+                v = x[i, j]
+                d = v - m
+                m += d / (j + 1)
+                m2 += d * (v - m)
+            mean[i] = m
+            std[i] = np.sqrt(m2 / n_cols)
+        return mean, std
+else:
+    _row_mean_std = _row_mean_std_numpy
 
 
 def extract_librosa_features_audio(y: np.ndarray, sr: int) -> np.ndarray:
     feats = []
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-    feats.append(mfcc.mean(axis=1))
-    feats.append(mfcc.std(axis=1))
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    feats.append(chroma.mean(axis=1))
-    feats.append(chroma.std(axis=1))
-    contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-    feats.append(contrast.mean(axis=1))
-    feats.append(contrast.std(axis=1))
+    # One STFT shared by every spectral feature below. Each librosa call given
+    # y= would otherwise recompute it (same n_fft/hop defaults, same result).
+    mag = np.abs(librosa.stft(y))
+    power = mag ** 2
+    log_mel = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=sr))
+
+    mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=20)
+    feats.extend(_row_mean_std(mfcc))
+    chroma = librosa.feature.chroma_stft(S=power, sr=sr)
+    feats.extend(_row_mean_std(chroma))
+    contrast = librosa.feature.spectral_contrast(S=mag, sr=sr)
+    feats.extend(_row_mean_std(contrast))
     tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(y), sr=sr)
-    feats.append(tonnetz.mean(axis=1))
-    feats.append(tonnetz.std(axis=1))
+    feats.extend(_row_mean_std(tonnetz))
     zcr = librosa.feature.zero_crossing_rate(y)
     feats.append(np.array([zcr.mean(), zcr.std()]))
-    sc = librosa.feature.spectral_centroid(y=y, sr=sr)
-    sbw = librosa.feature.spectral_bandwidth(y=y, sr=sr)
-    sro = librosa.feature.spectral_rolloff(y=y, sr=sr)
+    sc = librosa.feature.spectral_centroid(S=mag, sr=sr)
+    sbw = librosa.feature.spectral_bandwidth(S=mag, sr=sr)
+    sro = librosa.feature.spectral_rolloff(S=mag, sr=sr)
     feats.append(np.array([sc.mean(), sc.std(), sbw.mean(), sbw.std(), sro.mean(), sro.std()]))
     rms = librosa.feature.rms(y=y)
     feats.append(np.array([rms.mean(), rms.std()]))
     try:
-        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        beat_env = librosa.onset.onset_strength(S=log_mel, sr=sr, aggregate=np.median)
+        tempo, _ = librosa.beat.beat_track(onset_envelope=beat_env, sr=sr)
     except Exception:
         tempo = 0.0
-    feats.append(np.array([tempo, np.abs(librosa.onset.onset_strength(y=y, sr=sr)).mean()]))
-    d_mfcc = librosa.feature.delta(mfcc, order=1)
+    feats.append(np.array([tempo, np.abs(librosa.onset.onset_strength(S=log_mel, sr=sr)).mean()]))
+    # Same Savitzky-Golay filter librosa.feature.delta(width=9, order=1) applies, minus its wrapper
+    d_mfcc = savgol_filter(mfcc, 9, polyorder=1, deriv=1, axis=-1, mode="interp")
     feats.append(d_mfcc.mean(axis=1))
 
     # Add statistical features that help distinguish cough vs normal
@@ -165,8 +227,22 @@ def extract_librosa_features_audio(y: np.ndarray, sr: int) -> np.ndarray:
     return vec
 
 
+def load_audio_mono(path: Path, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
+    try:
+        y, sr = sf.read(path.as_posix(), dtype="float32", always_2d=False)
+    except Exception:
+        # Containers libsndfile can't decode (m4a/aac, some mp3) go through librosa/audioread
+        return librosa.load(path.as_posix(), sr=target_sr, mono=True)
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    if sr != target_sr:
+        y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+        sr = target_sr
+    return y, sr
+
+
 def extract_features_file(path: Path, target_sr: int = 16000) -> np.ndarray:
-    y, sr = librosa.load(path.as_posix(), sr=target_sr, mono=True)
+    y, sr = load_audio_mono(path, target_sr)
     y = librosa.util.normalize(y)
     if HAVE_OPENSMILE:
         try:
@@ -182,59 +258,198 @@ def extract_features_file(path: Path, target_sr: int = 16000) -> np.ndarray:
     return vec
 
 
+def _feature_cache_path(path: Path, target_sr: int) -> Path:
+    st = path.stat()
+    backend = "opensmile" if HAVE_OPENSMILE else "librosa"
+    key = (f"{path.resolve()}|{st.st_mtime_ns}|{st.st_size}|{target_sr}|{backend}"
+           f"|{N_FEATURES_EXPECTED}|v{TRAIN_FEATURE_VERSION}")
+    return FEATURE_CACHE_DIR / f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.npy"
+
+
+def extract_features_cached(path: Path, target_sr: int = 16000,
+                            use_cache: bool = True, cache_regenerate: bool = False) -> np.ndarray:
+    if not use_cache:
+        return extract_features_file(path, target_sr)
+    cache_path = _feature_cache_path(path, target_sr)
+    if cache_path.exists() and not cache_regenerate:
+        try:
+            return np.load(cache_path)
+        except Exception as e:
+            warnings.warn(f"Ignoring unreadable feature cache {cache_path}: {e}")
+
+    vec = extract_features_file(path, target_sr)
+    FEATURE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so a concurrent reader never sees a partial file
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, vec)
+    os.replace(tmp_path, cache_path)
+    return vec
+
+
 # ----------------------------
 # Dataset Loaders
 # ----------------------------
-def load_csv_dataset(csv_path: Path) -> Tuple[np.ndarray, np.ndarray]:
-    df = pd.read_csv(csv_path, header=None)
-    if df.shape[1] == 1:
+def _extract_job(job: Tuple[Path, bool, bool]) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    # Module-level so ProcessPoolExecutor can pickle it; errors are returned, not raised
+    path, use_cache, cache_regenerate = job
+    try:
+        return extract_features_cached(path, use_cache=use_cache, cache_regenerate=cache_regenerate), None
+    except Exception as e:
+        return None, str(e)
+
+
+def resolve_n_jobs(n_jobs: int) -> int:
+    # joblib convention: -1 = all cores, -2 = all but one, ...
+    n_cpu = os.cpu_count() or 1
+    return max(1, n_cpu + 1 + n_jobs if n_jobs < 0 else n_jobs)
+
+
+def _iter_extracted(work: List[Tuple[Path, bool, bool]], n_jobs: int = -1):
+    n_workers = min(resolve_n_jobs(n_jobs), len(work))
+    if n_workers > 1:
+        print(f"[INFO] Extracting features for {len(work)} files with {n_workers} worker processes")
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            yield from ex.map(_extract_job, work, chunksize=max(1, len(work) // (n_workers * 4)))
+    else:
+        for w in work:
+            yield _extract_job(w)
+
+
+def _open_feature_matrix(n_rows: int, out_path: Optional[Path]) -> np.ndarray:
+    if out_path is None:
+        return np.empty((n_rows, N_FEATURES_EXPECTED), dtype=np.float32)
+    # Backed by a .npy file so rows go straight to disk instead of piling up in RAM
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32,
+                                     shape=(n_rows, N_FEATURES_EXPECTED))
+
+
+def _finalize_feature_file(X: np.ndarray, n_rows: int, y: np.ndarray, out_path: Path) -> np.ndarray:
+    if n_rows < X.shape[0]:
+        # Drop the slots of files that failed so the .npy holds exactly the labelled rows
+        tmp_path = out_path.with_name(out_path.stem + ".tmp.npy")
+        trimmed = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                            shape=(n_rows, N_FEATURES_EXPECTED))
+        trimmed[:] = X[:n_rows]
+        trimmed.flush()
+        del trimmed, X
+        os.replace(tmp_path, out_path)
+    else:
+        X.flush()
+        del X
+    np.save(out_path.with_name(out_path.stem + "_labels.npy"), y)
+    print(f"[OK] Streamed {n_rows} feature rows to: {out_path}")
+    return np.load(out_path, mmap_mode="r")
+
+
+def extract_features_for_jobs(jobs: List[Tuple[Path, str]], use_cache: bool = True,
+                              cache_regenerate: bool = False,
+                              out_path: Optional[Path] = None,
+                              n_jobs: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    work = [(path, use_cache, cache_regenerate) for path, _ in jobs]
+
+    # Rows are written in place as workers finish; no list-of-vectors + vstack copy
+    X = _open_feature_matrix(len(jobs), out_path)
+    y_list = []
+    for (path, label), (vec, err) in zip(jobs, _iter_extracted(work, n_jobs)):
+        if vec is None:
+            warnings.warn(f"Failed to extract features from {path}: {err}")
+            continue
+        X[len(y_list)] = vec
+        y_list.append(label)
+
+    y = np.array(y_list, dtype=str)
+    if out_path is not None:
+        return _finalize_feature_file(X, len(y_list), y, out_path), y
+    return X[:len(y_list)], y
+
+
+def load_csv_dataset(csv_path: Path, use_cache: bool = True,
+                     cache_regenerate: bool = False,
+                     features_out: Optional[Path] = None,
+                     n_jobs: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    # Sniff the layout from a few rows, then parse the full file once with known dtypes
+    # (a plain read_csv infers every column as object before we cast to float32).
+    head = pd.read_csv(csv_path, header=None, nrows=5)
+    n_cols = head.shape[1]
+    if n_cols == 1:
         raise ValueError("CSV has only one column. It must include both filename and label.")
-    elif df.shape[1] == 2:
+    elif n_cols == 2:
         # Check if first column looks like filenames (ends with audio extensions)
-        first_col = df.iloc[:, 0].astype(str)
-        is_filename_col = any(
-            any(str(val).lower().endswith(ext) for ext in AUDIO_EXTS)
-            for val in first_col.head(5)  # Check first 5 rows
-        )
+        first_col = head.iloc[:, 0].astype(str)
+        is_filename_col = bool(first_col.str.strip().str.lower().str.endswith(tuple(AUDIO_EXTS)).any())
         if is_filename_col:
             # Treat as filename and label columns
-            df.columns = ["filename", "label"]
-            X_list, y_list = [], []
+            df = pd.read_csv(csv_path, header=None, names=["filename", "label"], dtype=str)
             data_dir = csv_path.parent
 
-            for i, row in df.iterrows():
-                file_path = data_dir / row["filename"]
+            # Column-wise access instead of df.iterrows(), which builds a Series per row
+            filenames = df["filename"].astype(str).str.strip().tolist()
+            labels = df["label"].tolist()
+            jobs = []
+            for fname, label in zip(filenames, labels):
+                file_path = data_dir / fname
                 if not file_path.exists():
                     warnings.warn(f"File not found: {file_path}")
                     continue
-                try:
-                    vec = extract_features_file(file_path)
-                    X_list.append(vec)
-                    y_list.append(row["label"])
-                except Exception as e:
-                    warnings.warn(f"Failed to extract features from {file_path}: {e}")
-
-            if not X_list:
-                raise RuntimeError("No audio features could be extracted. Check your CSV and file paths.")
+                jobs.append((file_path, label))
 
-            X = np.vstack(X_list)
-            y = np.array(y_list, dtype=str)
+            X, y = extract_features_for_jobs(jobs, use_cache, cache_regenerate, features_out, n_jobs)
+            if X.shape[0] == 0:
+                raise RuntimeError("No audio features could be extracted. Check your CSV and file paths.")
         else:
             # Treat as features and label (last column is label, first is features)
             print(f"[INFO] Detected 2 columns, first does not look like filenames. Treating as pre-extracted features + label.")
-            X = df.iloc[:, :-1].values.astype(np.float32)
-            y = df.iloc[:, -1].values.astype(str)
+            X, y = _read_feature_csv(csv_path, n_cols)
     else:
         # Assume features + label (last column is label, rest are features)
-        print(f"[INFO] Detected {df.shape[1]} columns. Treating as pre-extracted features + label.")
-        X = df.iloc[:, :-1].values.astype(np.float32)
-        y = df.iloc[:, -1].values.astype(str)
+        print(f"[INFO] Detected {n_cols} columns. Treating as pre-extracted features + label.")
+        X, y = _read_feature_csv(csv_path, n_cols)
+    return X, y
+
+
+def _read_feature_csv(csv_path: Path, n_cols: int) -> Tuple[np.ndarray, np.ndarray]:
+    df = pd.read_csv(csv_path, header=None, engine="c",
+                     dtype={i: np.float32 for i in range(n_cols - 1)})
+    X = df.iloc[:, :-1].to_numpy(dtype=np.float32)
+    y = df.iloc[:, -1].to_numpy().astype(str)
+    return X, y
+
+
+def load_npz_dataset(npz_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    # Binary dump written by --export-npz: no text parsing, dtype preserved
+    with np.load(npz_path, allow_pickle=False) as data:
+        X = data["X"].astype(np.float32, copy=False)
+        y = data["y"].astype(str)
+    return X, y
+
+
+def load_npy_dataset(npy_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    # Matrix written by --features-out; memory-mapped so loading is cheap, but the
+    # train/test split and SMOTE still copy the rows into RAM for fitting
+    labels_path = npy_path.with_name(npy_path.stem + "_labels.npy")
+    if not labels_path.exists():
+        raise FileNotFoundError(f"Labels file not found next to feature matrix: {labels_path}")
+    X = np.load(npy_path, mmap_mode="r")
+    y = np.load(labels_path).astype(str)
+    if X.shape[0] != y.shape[0]:
+        raise ValueError(f"Feature rows ({X.shape[0]}) and labels ({y.shape[0]}) do not match.")
     return X, y
 
 
-def load_folder_dataset(root: Path) -> Tuple[np.ndarray, np.ndarray]:
+def export_npz_dataset(npz_path: Path, X: np.ndarray, y: np.ndarray):
+    npz_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(npz_path, X=np.ascontiguousarray(X, dtype=np.float32), y=np.asarray(y, dtype=str))
+    print(f"[OK] Saved feature dump to: {npz_path}")
+
+
+def load_folder_dataset(root: Path, use_cache: bool = True,
+                        cache_regenerate: bool = False,
+                        features_out: Optional[Path] = None,
+                        n_jobs: int = -1) -> Tuple[np.ndarray, np.ndarray]:
     by_class = list_audio_files_by_class(root)
-    X_list, y_list = [], []
+    jobs = []
 
     # Balance classes by taking at most 25 samples per class (to match normal class size)
     max_samples_per_class = 25
@@ -244,24 +459,41 @@ def load_folder_dataset(root: Path) -> Tuple[np.ndarray, np.ndarray]:
             continue  # Skip silence as it has no samples
         sampled_files = files[:max_samples_per_class]  # Undersample majority classes
         print(f"[INFO] Using {len(sampled_files)} samples for class '{label}' (from {len(files)} available)")
+        jobs.extend((f, label) for f in sampled_files)
 
-        for f in sampled_files:
-            try:
-                vec = extract_features_file(f)
-                X_list.append(vec)
-                y_list.append(label)
-            except Exception as e:
-                warnings.warn(f"Failed to extract features from {f}: {e}")
-
-    if not X_list:
+    X, y = extract_features_for_jobs(jobs, use_cache, cache_regenerate, features_out, n_jobs)
+    if X.shape[0] == 0:
         raise RuntimeError("No features extracted from folder dataset.")
-    return np.vstack(X_list), np.array(y_list, dtype=str)
+    return X, y
 
 
 # ----------------------------
 # Training Function
 # ----------------------------
-def train_rf_balanced(X: np.ndarray, y: np.ndarray, random_state: int = 42):
+def build_classifier(model_type: str = "rf", random_state: int = 42, n_jobs: int = -1):
+    if model_type == "hgb":
+        # Binned features + shallow boosted trees: small pickle, fast per-request predict
+        return HistGradientBoostingClassifier(
+            max_iter=300,
+            max_depth=8,
+            learning_rate=0.05,
+            early_stopping=True,
+            class_weight="balanced",
+            random_state=random_state,
+        )
+    # Bounded depth/leaves keep each tree walk short and the pickle small
+    return RandomForestClassifier(
+        n_estimators=100,
+        max_depth=12,
+        max_leaf_nodes=64,
+        random_state=random_state,
+        n_jobs=n_jobs,
+        class_weight=None  # Remove class weights to avoid bias
+    )
+
+
+def train_classifier_balanced(X: np.ndarray, y: np.ndarray, random_state: int = 42, n_jobs: int = -1,
+                              model_type: str = "rf"):
     le = LabelEncoder()
     y_enc = le.fit_transform(y)
 
@@ -295,13 +527,7 @@ def train_rf_balanced(X: np.ndarray, y: np.ndarray, random_state: int = 42):
     print(f"[INFO] Original training samples: {X_train.shape[0]}")
     print(f"[INFO] SMOTE training samples: {X_train_smote.shape[0]}")
 
-    clf = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=None,
-        random_state=random_state,
-        n_jobs=-1,
-        class_weight=None  # Remove class weights to avoid bias
-    )
+    clf = build_classifier(model_type, random_state, n_jobs)
     clf.fit(X_train_smote, y_train_smote)
 
     y_pred = clf.predict(X_test)
@@ -318,12 +544,18 @@ def train_rf_balanced(X: np.ndarray, y: np.ndarray, random_state: int = 42):
 # ----------------------------
 # Save Artifacts
 # ----------------------------
-def save_artifacts(model: RandomForestClassifier, le: LabelEncoder):
+# Tree arrays compress well. zlib ships with every Python, so the API, the HF Space
+# and the analysis scripts can always load the model whatever the training box had.
+MODEL_COMPRESSION = 3
+
+
+def save_artifacts(model, le: LabelEncoder, model_path: Path = MODEL_OUT_PATH):
     ensure_output_dirs()
-    joblib.dump(model, MODEL_OUT_PATH)
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, model_path, compress=MODEL_COMPRESSION, protocol=5)
     with open(LABEL_MAP_OUT_PATH, "w") as f:
         json.dump({str(i): lab for i, lab in enumerate(le.classes_)}, f, indent=2)
-    print(f"[OK] Saved model to: {MODEL_OUT_PATH}")
+    print(f"[OK] Saved model to: {model_path}")
     print(f"[OK] Saved label map to: {LABEL_MAP_OUT_PATH}")
 
 
@@ -331,10 +563,22 @@ def save_artifacts(model: RandomForestClassifier, le: LabelEncoder):
 # CLI
 # ----------------------------
 def parse_args():
-    ap = argparse.ArgumentParser(description="Train RandomForest model for Breath Easy.")
-    ap.add_argument("--data", type=str, default=None, help="Path to dataset (CSV or folder)")
+    ap = argparse.ArgumentParser(description="Train RandomForest / HistGradientBoosting model for Breath Easy.")
+    ap.add_argument("--data", type=str, default=None, help="Path to dataset (CSV, .npz/.npy feature dump or folder)")
     ap.add_argument("--csv", action="store_true", help="Force CSV mode.")
     ap.add_argument("--folder", action="store_true", help="Force folder mode.")
+    ap.add_argument("--no-cache", action="store_true", help="Do not read or write the per-file feature cache.")
+    ap.add_argument("--cache-regenerate", action="store_true", help="Recompute features and overwrite cached entries.")
+    ap.add_argument("--features-out", type=str, default=None,
+                    help="Stream extracted features to this .npy file (labels go to <name>_labels.npy). "
+                         "Only bounds memory during extraction: the split and SMOTE still copy the "
+                         "matrix into RAM for fitting.")
+    ap.add_argument("--export-npz", type=str, default=None,
+                    help="Also save the loaded feature matrix + labels as a compressed .npz for fast reloads.")
+    ap.add_argument("--model", choices=["rf", "hgb"], default="rf",
+                    help="Classifier: depth-capped RandomForest (rf) or HistGradientBoosting (hgb).")
+    ap.add_argument("--jobs", type=int, default=-1,
+                    help="Worker count for feature extraction and forest fitting (-1 = all cores).")
     return ap.parse_args()
 
 
@@ -347,7 +591,19 @@ def main():
         raise ValueError("Choose only one of --csv or --folder.")
     mode_csv = is_csv_dataset(data_path) if not (args.csv or args.folder) else args.csv
 
-    X, y = load_csv_dataset(data_path) if mode_csv else load_folder_dataset(data_path)
+    use_cache = not args.no_cache
+    features_out = Path(args.features_out) if args.features_out else None
+    if is_npz_dataset(data_path):
+        X, y = load_npz_dataset(data_path)
+    elif is_npy_dataset(data_path):
+        X, y = load_npy_dataset(data_path)
+    elif mode_csv:
+        X, y = load_csv_dataset(data_path, use_cache, args.cache_regenerate, features_out, args.jobs)
+    else:
+        X, y = load_folder_dataset(data_path, use_cache, args.cache_regenerate, features_out, args.jobs)
+
+    if args.export_npz:
+        export_npz_dataset(Path(args.export_npz), X, y)
 
     if X.shape[1] != N_FEATURES_EXPECTED:
         print(f"[WARN] Adjusting features from {X.shape[1]} to {N_FEATURES_EXPECTED}.")
@@ -356,8 +612,8 @@ def main():
     print(f"[INFO] Samples: {X.shape[0]}, Features: {X.shape[1]}")
     print(f"[INFO] Classes: {len(np.unique(y))} -> {sorted(np.unique(y).tolist())}")
 
-    model, acc, le = train_rf_balanced(X, y)
-    save_artifacts(model, le)
+    model, acc, le = train_classifier_balanced(X, y, n_jobs=args.jobs, model_type=args.model)
+    save_artifacts(model, le, HGB_MODEL_OUT_PATH if args.model == "hgb" else MODEL_OUT_PATH)
     print("[DONE] Training complete.")
 
 
@@ -7,9 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 import numpy as np
 import joblib
-import io
+import asyncio
 import json
 import soundfile as sf
+from contextlib import asynccontextmanager
 
 try:
     from backend.app.services.feature_extraction import extract_features as be_extract_features
@@ -17,16 +18,6 @@ except ImportError:
     be_extract_features = None
     print("⚠️ Warning: Could not import full feature extractor")
 
-app = FastAPI(title="Breath Easy API", version="0.1.0")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 MODEL = None
 LABELS = None
 
@@ -36,22 +27,49 @@ def _lazy_load_model():
     global MODEL, LABELS
     if MODEL is None:
         MODEL = joblib.load("model_rf.pkl")
+        # Single-row requests: keep tree evaluation inline instead of a per-call thread pool
+        if hasattr(MODEL, "n_jobs"):
+            MODEL.n_jobs = 1
     if LABELS is None:
         with open("label_map.json", "r") as f:
             LABELS = json.load(f)
 
 
+def _warm_model():
+    """Load the model at boot and run one dummy prediction so the first request isn't cold."""
+    try:
+        _lazy_load_model()
+        n_features = getattr(MODEL, "n_features_in_", 120)
+        MODEL.predict_proba(np.zeros((1, n_features), dtype=np.float32))
+    except Exception as e:
+        print(f"⚠️ Warning: model warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(_warm_model)
+    yield
+
+
+app = FastAPI(title="Breath Easy API", version="0.1.0", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "breath-easy-backend"}
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    """Run respiratory sound prediction."""
-    _lazy_load_model()
-    raw = await file.read()
-    data, sr = sf.read(io.BytesIO(raw))
+def _extract_model_features(src) -> np.ndarray:
+    """Decode the uploaded audio and build the model input (CPU-bound)."""
+    data, sr = sf.read(src)
     if data.ndim > 1:
         data = np.mean(data, axis=1)
 
@@ -63,22 +81,45 @@ async def predict(file: UploadFile = File(...)):
         # Simple fallback (just mean/std)
         audio = data.astype(np.float32)
         feats = np.array([np.mean(audio), np.std(audio)], dtype=np.float32).reshape(1, -1)
+    return feats
 
-    try:
-        # Ensure feats is 2D for sklearn
-        if feats.ndim == 1:
-            feats = feats.reshape(1, -1)
 
+def _predict_label(feats: np.ndarray) -> dict:
+    # Ensure feats is 2D for sklearn
+    if feats.ndim == 1:
+        feats = feats.reshape(1, -1)
+
+    proba = getattr(MODEL, "predict_proba", None)
+    if callable(proba):
+        # One forest pass: argmax of the probabilities is exactly what predict() returns
+        probs = proba(feats)[0]
+        best = int(np.argmax(probs))
+        label_idx = MODEL.classes_[best]
+        conf = float(probs[best])
+    else:
         pred = MODEL.predict(feats)
-        proba = getattr(MODEL, "predict_proba", None)
-        conf = float(np.max(proba(feats))) if callable(proba) else None
         label_idx = pred[0] if len(pred) else None
-        label_name = None
-        if LABELS is not None and label_idx is not None:
-            if isinstance(LABELS, dict):
-                label_name = LABELS.get(str(label_idx), LABELS.get(label_idx))
-            elif isinstance(LABELS, list) and isinstance(label_idx, (int, np.integer)) and label_idx < len(LABELS):
-                label_name = LABELS[label_idx]
-        return {"prediction": int(label_idx) if label_idx is not None else None, "label": label_name, "confidence": conf}
+        conf = None
+    label_name = None
+    if LABELS is not None and label_idx is not None:
+        if isinstance(LABELS, dict):
+            label_name = LABELS.get(str(label_idx), LABELS.get(label_idx))
+        elif isinstance(LABELS, list) and isinstance(label_idx, (int, np.integer)) and label_idx < len(LABELS):
+            label_name = LABELS[label_idx]
+    return {"prediction": int(label_idx) if label_idx is not None else None, "label": label_name, "confidence": conf}
+
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...)):
+    """Run respiratory sound prediction."""
+    await asyncio.to_thread(_lazy_load_model)
+    # Decoding, feature extraction and inference run in a worker thread so the
+    # event loop keeps accepting uploads while one request is being processed.
+    # The upload's spooled file is decoded in place rather than copied into a bytes blob.
+    await file.seek(0)
+    feats = await asyncio.to_thread(_extract_model_features, file.file)
+
+    try:
+        return await asyncio.to_thread(_predict_label, feats)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)